@@ -1,30 +1,70 @@
+import logging
 import os
 import uuid
 from pymongo import MongoClient
 
+log = logging.getLogger(__name__)
+
+# Read the connection settings once at import so a missing variable fails fast
+_MISSING_ENV = [name for name in ('MONGO_USER', 'MONGO_PASS', 'MONGO_HOST', 'MONGO_PORT') if name not in os.environ]
+if _MISSING_ENV:
+    raise Exception(f"Missing MongoDB environment variables: {', '.join(_MISSING_ENV)}")
+
+_USER, _PASS, _HOST = (os.environ[name] for name in ('MONGO_USER', 'MONGO_PASS', 'MONGO_HOST'))
+try:
+    _PORT = int(os.environ['MONGO_PORT'])
+except ValueError:
+    raise Exception(f"Invalid MongoDB environment variable MONGO_PORT: {os.environ['MONGO_PORT']!r} is not a port number") from None
+_MONGO_URI = f'mongodb://{_USER}:{_PASS}@{_HOST}:{_PORT}'
+
+DB = 'AAC'  # MongoDB database name
+COL = 'animals'  # MongoDB collection name
+
 
 class AnimalShelter:
     """CRUD operations for the Animal collection in MongoDB."""
 
-    def __init__(self):
-        """Initialize MongoDB connection using environment variables."""
-        # Fetch connection variables from environment
-        USER = os.getenv('MONGO_USER')  # Fetch MongoDB user
-        PASS = os.getenv('MONGO_PASS')  # Fetch MongoDB password
-        HOST = os.getenv('MONGO_HOST')  # Fetch MongoDB host
-        PORT = int(os.getenv('MONGO_PORT'))  # Fetch MongoDB port
-        DB = 'AAC'  # MongoDB database name
-        COL = 'animals'  # MongoDB collection name
+    # Shared MongoClient (and its connection pool) reused across instances
+    _client = None
+
+    # Indexes are ensured once per process, not once per instance
+    _indexes_created = False
 
+    def __init__(self):
+        """Initialize MongoDB connection using the settings read from the environment."""
         try:
-            # Initialize MongoDB connection
-            self.client = MongoClient(f'mongodb://{USER}:{PASS}@{HOST}:{PORT}')
+            # Initialize the pooled MongoDB connection once and reuse it
+            if AnimalShelter._client is None:
+                AnimalShelter._client = MongoClient(
+                    _MONGO_URI,
+                    maxPoolSize=50,
+                    minPoolSize=5,
+                    serverSelectionTimeoutMS=2000,
+                    appname='cs340-dash'
+                )
+            self.client = AnimalShelter._client
             self.database = self.client[DB]
             self.collection = self.database[COL]
-            print(f"Connected to MongoDB database: {DB}, collection: {COL}")
+            log.debug("Connected to MongoDB database: %s, collection: %s", DB, COL)
         except Exception as e:
             raise Exception(f"Failed to connect to MongoDB: {e}")
 
+        if not AnimalShelter._indexes_created:
+            self.create_indexes()
+            AnimalShelter._indexes_created = True
+
+    def create_indexes(self):
+        """Create the index used by the dashboard queries (idempotent)."""
+        try:
+            # Matches the breed/sex/age shape of the rescue-type filters
+            self.collection.create_index(
+                [("breed", 1), ("sex_upon_outcome", 1), ("age_upon_outcome_in_weeks", 1)],
+                background=True,
+                name="rescue_filter_idx"
+            )
+        except Exception as e:
+            log.error("An error occurred while creating indexes: %s", e)
+
     def generate_uuid(self):
         """Generate a unique UUID for animal_id."""
         return str(uuid.uuid4())  # Generate and return a UUID as a string
@@ -36,18 +76,26 @@ class AnimalShelter:
                 self.collection.insert_one(data)
                 return True
             except Exception as e:
-                print(f"An error occurred: {e}")
+                log.error("An error occurred: %s", e)
                 return False
         else:
             raise ValueError("No data provided for insertion.")
 
-    def read(self, query):
-        """Query documents from the collection."""
+    def read(self, query, projection=None):
+        """Query documents from the collection, optionally limiting the returned fields."""
         try:
-            cursor = self.collection.find(query)
+            cursor = self.collection.find(query, projection)
             return [doc for doc in cursor]
         except Exception as e:
-            print(f"An error occurred: {e}")
+            log.error("An error occurred: %s", e)
+            return []
+
+    def aggregate(self, pipeline):
+        """Run an aggregation pipeline on the collection."""
+        try:
+            return list(self.collection.aggregate(pipeline))
+        except Exception as e:
+            log.error("An error occurred during aggregation: %s", e)
             return []
 
     def update(self, query, update_values):
@@ -56,7 +104,7 @@ class AnimalShelter:
             result = self.collection.update_many(query, update_values)
             return result.modified_count
         except Exception as e:
-            print(f"An error occurred during update: {e}")
+            log.error("An error occurred during update: %s", e)
             return 0
 
     def delete(self, query):
@@ -65,10 +113,19 @@ class AnimalShelter:
             result = self.collection.delete_many(query)
             return result.deleted_count
         except Exception as e:
-            print(f"An error occurred during delete: {e}")
+            log.error("An error occurred during delete: %s", e)
             return 0
 
-    def close_connection(self):
-        """Close the MongoDB connection."""
-        self.client.close()
-        print("MongoDB connection closed.")
+    @classmethod
+    def close_connection(cls):
+        """
+        Close the shared MongoDB connection.
+
+        The client is shared by every AnimalShelter instance, so this affects all of
+        them; create new instances afterwards to reconnect.
+        """
+        if cls._client is not None:
+            cls._client.close()
+            cls._client = None
+            cls._indexes_created = False
+        log.debug("MongoDB connection closed.")
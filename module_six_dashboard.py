@@ -33,6 +33,9 @@ License:
 """
 
 # Import necessary libraries
+import functools
+from collections import Counter
+import logging
 from jupyter_dash import JupyterDash
 import dash_leaflet as dl
 from dash import dcc, html, dash_table
@@ -40,12 +43,97 @@ from dash.dependencies import Input, Output
 import pandas as pd
 from crud_operations import AnimalShelter
 import plotly.express as px
+import plotly.graph_objects as go
+
+log = logging.getLogger(__name__)
 
 # ============================================================
 # Constants for Default Values
 # ============================================================
 DEFAULT_LAT = 30.75
 DEFAULT_LON = -97.48
+DEFAULT_CENTER = [DEFAULT_LAT, DEFAULT_LON]
+
+# Base map layer shared by every map update
+BASE_TILE_LAYER = dl.TileLayer(id="base-layer-id")
+DEFAULT_MAP_CHILDREN = [BASE_TILE_LAYER]
+
+# Fields rendered by the dashboard; '_id' is excluded server-side
+FIELDS = {
+    "_id": 0,
+    "location_lat": 1,
+    "location_long": 1,
+    "breed": 1,
+    "sex_upon_outcome": 1,
+    "age_upon_outcome_in_weeks": 1,
+    "name": 1
+}
+
+# MongoDB queries for each rescue type
+RESCUE_QUERIES = {
+    'Water': {
+        "breed": {"$in": ["Labrador Retriever Mix", "Chesapeake Bay Retriever", "Newfoundland"]},
+        "sex_upon_outcome": "Intact Female",
+        "age_upon_outcome_in_weeks": {"$gte": 26, "$lte": 156}
+    },
+    'Mountain': {
+        "breed": {"$in": ["German Shepherd", "Alaskan Malamute", "Old English Sheepdog", "Siberian Husky", "Rottweiler"]},
+        "sex_upon_outcome": "Intact Male",
+        "age_upon_outcome_in_weeks": {"$gte": 26, "$lte": 156}
+    },
+    'Disaster': {
+        "breed": {"$in": ["Doberman Pinscher", "German Shepherd", "Golden Retriever", "Bloodhound", "Rottweiler"]},
+        "sex_upon_outcome": "Intact Male",
+        "age_upon_outcome_in_weeks": {"$gte": 20, "$lte": 300}
+    },
+    'Reset': {}
+}
+
+# ============================================================
+# Helper functions
+# ============================================================
+def coerce_coordinates(records):
+    """
+    Convert the coordinates of query results to floats, falling back to the default location.
+    """
+    for record in records:
+        for field, default in (('location_lat', DEFAULT_LAT), ('location_long', DEFAULT_LON)):
+            try:
+                value = float(record.get(field))
+                record[field] = default if value != value else value  # NaN check
+            except (TypeError, ValueError):
+                record[field] = default
+    return records
+
+
+def build_pie_chart(labels, values, title, colorway=None):
+    """
+    Build a pie chart from pre-aggregated labels and values.
+    """
+    return go.Figure(
+        go.Pie(labels=list(labels), values=list(values)),
+        layout=go.Layout(title=title, piecolorway=colorway)
+    )
+
+
+def build_reset_pie(breeds):
+    """
+    Build the "Reset" pie chart, aggregating breeds under 2% into "Others".
+    """
+    # Aggregate from the breed counts, without building a per-row grouped column
+    breed_counts = breeds.value_counts()
+    is_common = breed_counts / breed_counts.sum() >= 0.02  # Breeds contributing >= 2%
+    grouped_counts = breed_counts[is_common]
+    other_count = breed_counts[~is_common].sum() + breeds.isna().sum()  # Missing breeds count as "Others"
+
+    # Create pie chart for aggregated data
+    return build_pie_chart(
+        list(grouped_counts.index) + (['Others'] if other_count else []),
+        list(grouped_counts.values) + ([other_count] if other_count else []),
+        "Breed Distribution (Aggregated)",
+        colorway=px.colors.qualitative.Set2  # Consistent color scheme
+    )
+
 
 # ============================================================
 # Initialize the AnimalShelter class and fetch data
@@ -53,16 +141,34 @@ DEFAULT_LON = -97.48
 # Create an instance of the AnimalShelter class
 shelter = AnimalShelter()
 
-# Fetch data from MongoDB and load it into a DataFrame
-df = pd.DataFrame.from_records(shelter.read({}))
-
-# Remove MongoDB's '_id' field to avoid compatibility issues
-if '_id' in df.columns:
-    df.drop(columns=['_id'], inplace=True)
+# Fetch only the displayed fields from MongoDB and load them into a DataFrame
+df = pd.DataFrame.from_records(shelter.read({}, FIELDS))
 
 # Handle case where DataFrame is empty
 if df.empty:
-    df = pd.DataFrame(columns=['location_lat', 'location_lon', 'breed', 'sex_upon_outcome', 'age_upon_outcome_in_weeks', 'name'])
+    df = pd.DataFrame(columns=[field for field, include in FIELDS.items() if include])
+
+# Validate coordinates once at load so the map callback can use them as-is
+df['location_lat'] = pd.to_numeric(df['location_lat'], errors='coerce').fillna(DEFAULT_LAT)
+df['location_long'] = pd.to_numeric(df['location_long'], errors='coerce').fillna(DEFAULT_LON)
+
+# ============================================================
+# Precompute the unfiltered ("Reset") view
+# ============================================================
+# The unfiltered dataset does not change during a session, so the
+# "Reset" filter reuses it instead of re-querying MongoDB.
+# itertuples yields plain tuples, avoiding the per-row overhead of df.to_dict('records')
+RESET_COLUMNS = df.columns.tolist()
+RESET_RECORDS = [dict(zip(RESET_COLUMNS, row)) for row in df.itertuples(index=False, name=None)]
+
+if df.empty:
+    RESET_PIE = build_pie_chart([], [], "No Data Available")
+else:
+    RESET_PIE = build_reset_pie(df['breed'])
+
+# Only the precomputed records, columns and chart are used after startup,
+# so release the DataFrame instead of keeping it for the session
+del df
 
 # ============================================================
 # Initialize the Dash application
@@ -103,7 +209,9 @@ html.Div([
             ],
             value='Reset',
             labelStyle={'display': 'inline-block', 'margin-right': '10px'}
-        )
+        ),
+        # Debounced copy of the selected rescue type (see the clientside callback below)
+        dcc.Store(id='pending-filter', data='Reset')
     ], style={'textAlign': 'center', 'margin': '20px'}),
 
     # Main content
@@ -113,9 +221,9 @@ html.Div([
             dash_table.DataTable(
                 id='datatable-id',
                 columns=[
-                    {"name": i, "id": i, "deletable": False, "selectable": True} for i in df.columns
+                    {"name": i, "id": i, "deletable": False, "selectable": True} for i in RESET_COLUMNS
                 ],
-                data=df.to_dict('records'),
+                data=RESET_RECORDS,
                 sort_action="native",
                 filter_action="native",
                 row_selectable="single",
@@ -131,7 +239,7 @@ html.Div([
         html.Div([
             # Pie chart on the left
             html.Div([
-                dcc.Graph(id='pie-chart-id')
+                dcc.Graph(id='pie-chart-id', figure=RESET_PIE)
             ], style={'width': '48%', 'display': 'inline-block', 'verticalAlign': 'top'}),
 
             # Map on the right
@@ -139,9 +247,9 @@ html.Div([
                 dl.Map(
                     id='map-id',
                     style={'width': '100%', 'height': '500px'},
-                    center=[DEFAULT_LAT, DEFAULT_LON],
+                    center=DEFAULT_CENTER,
                     zoom=10,
-                    children=[dl.TileLayer(id="base-layer-id")]
+                    children=DEFAULT_MAP_CHILDREN
                 )
             ], style={'width': '48%', 'display': 'inline-block', 'verticalAlign': 'top', 'margin-left': '2%'})
         ], style={'display': 'flex', 'justify-content': 'space-between'})  # Flexbox for side-by-side layout
@@ -153,76 +261,89 @@ html.Div([
 # Define callback functions for interactivity
 # ============================================================
 
-@app.callback(
-    [Output('datatable-id', 'data'),
-     Output('pie-chart-id', 'figure')],
-    Input('filter-rescue-type', 'value')
+# Debounce the rescue type filter in the browser so rapid clicks only
+# trigger a single server-side query for the last selected value
+app.clientside_callback(
+    """
+    function(value) {
+        window._filterSeq = (window._filterSeq || 0) + 1;
+        const seq = window._filterSeq;
+        return new Promise(function(resolve) {
+            setTimeout(function() {
+                // Only the most recent click within the window updates the store
+                resolve(seq === window._filterSeq ? value : window.dash_clientside.no_update);
+            }, 250);
+        });
+    }
+    """,
+    Output('pending-filter', 'data'),
+    Input('filter-rescue-type', 'value'),
+    prevent_initial_call=True
 )
-def filter_data_and_update_charts(rescue_type):
+
+
+# Filter results cached per rescue type for the session
+FILTER_CACHE = {}
+
+
+def fetch_filtered_data(rescue_type):
     """
-    Dynamically filter the data table and update the pie chart based on the selected rescue type.
+    Query the records and build the pie chart for a rescue type.
+
+    The data is static within a session, so results are cached per rescue type.
+    Empty results are not cached because the CRUD methods also return empty
+    results when a query fails.
     """
-    # Define query for MongoDB based on the rescue type
-    query = {}
-
-    if rescue_type == 'Water':
-        query = {
-            "breed": {"$in": ["Labrador Retriever Mix", "Chesapeake Bay Retriever", "Newfoundland"]},
-            "sex_upon_outcome": "Intact Female",
-            "age_upon_outcome_in_weeks": {"$gte": 26, "$lte": 156}
-        }
-    elif rescue_type == 'Mountain':
-        query = {
-            "breed": {"$in": ["German Shepherd", "Alaskan Malamute", "Old English Sheepdog", "Siberian Husky", "Rottweiler"]},
-            "sex_upon_outcome": "Intact Male",
-            "age_upon_outcome_in_weeks": {"$gte": 26, "$lte": 156}
-        }
-    elif rescue_type == 'Disaster':
-        query = {
-            "breed": {"$in": ["Doberman Pinscher", "German Shepherd", "Golden Retriever", "Bloodhound", "Rottweiler"]},
-            "sex_upon_outcome": "Intact Male",
-            "age_upon_outcome_in_weeks": {"$gte": 20, "$lte": 300}
-        }
-
-    # Fetch data from MongoDB based on the query
-    filtered_records = pd.DataFrame.from_records(shelter.read(query))
-
-    # Handle the "Reset" case: fetch all data
-    if rescue_type == 'Reset':
-        filtered_records = pd.DataFrame.from_records(shelter.read({}))
+    # Handle the "Reset" case: reuse the unfiltered data and pie chart loaded at
+    # startup, unless that load came back empty (e.g. MongoDB was unavailable)
+    if rescue_type == 'Reset' and RESET_RECORDS:
+        return RESET_RECORDS, RESET_PIE
+
+    if rescue_type in FILTER_CACHE:
+        return FILTER_CACHE[rescue_type]
 
-    # Remove '_id' column for compatibility
-    if '_id' in filtered_records.columns:
-        filtered_records.drop(columns=['_id'], inplace=True)
+    # Look up the MongoDB query for the rescue type
+    query = RESCUE_QUERIES.get(rescue_type, {})
+
+    # Fetch data from MongoDB based on the query; the DataTable takes the records as-is
+    records = coerce_coordinates(shelter.read(query, FIELDS))
 
     # If no records match, return an empty DataTable and a placeholder pie chart
-    if filtered_records.empty:
-        return [], px.pie(title="No Data Available")
+    if not records:
+        return [], build_pie_chart([], [], "No Data Available")
 
-    # Create a pie chart for the filtered data
     if rescue_type == 'Reset':
-        # Aggregate smaller breeds into "Others" for "Reset"
-        breed_counts = filtered_records['breed'].value_counts(normalize=True) * 100
-        common_breeds = breed_counts[breed_counts >= 2].index  # Breeds contributing >= 2%
-        filtered_records['breed_grouped'] = filtered_records['breed'].apply(lambda x: x if x in common_breeds else 'Others')
-
-        # Create pie chart for aggregated data
-        pie_chart = px.pie(
-            filtered_records,
-            names='breed_grouped',
-            title="Breed Distribution (Aggregated)",
-            color_discrete_sequence=px.colors.qualitative.Set2  # Consistent color scheme
-        )
+        # Rebuild the aggregated "Reset" pie chart from the fetched records
+        pie_chart = build_reset_pie(pd.Series([record.get('breed') for record in records], dtype=object))
     else:
+        # Count breeds from the records already fetched for the DataTable, so the
+        # table and the chart always show the same data
+        breed_counts = Counter(record.get('breed') for record in records)
+
         # Create pie chart for filtered data
-        pie_chart = px.pie(
-            filtered_records,
-            names='breed',
-            title=f"Breed Distribution for {rescue_type} Rescue"
+        pie_chart = build_pie_chart(
+            breed_counts.keys(),
+            breed_counts.values(),
+            f"Breed Distribution for {rescue_type} Rescue"
         )
 
+    FILTER_CACHE[rescue_type] = (records, pie_chart)
+
     # Return filtered DataTable data and the updated pie chart
-    return filtered_records.to_dict('records'), pie_chart
+    return records, pie_chart
+
+
+@app.callback(
+    [Output('datatable-id', 'data'),
+     Output('pie-chart-id', 'figure')],
+    Input('pending-filter', 'data'),
+    prevent_initial_call=True  # The layout already renders the "Reset" view
+)
+def filter_data_and_update_charts(rescue_type):
+    """
+    Dynamically filter the data table and update the pie chart based on the selected rescue type.
+    """
+    return fetch_filtered_data(rescue_type)
 
 
 #Callback for map update
@@ -238,67 +359,52 @@ def update_map(viewData, selected_rows):
     """
     # Default center and tile layer if no rows are selected
     if not viewData or not selected_rows:
-        print("No data or selected rows provided.")
-        return [DEFAULT_LAT, DEFAULT_LON], [dl.TileLayer(id="base-layer-id")]
+        log.debug("No data or selected rows provided.")
+        return DEFAULT_CENTER, DEFAULT_MAP_CHILDREN
 
     try:
-        # Convert the virtual data into a DataFrame
-        dff = pd.DataFrame.from_dict(viewData)
-
-        # Ensure a row is selected
-        if selected_rows:
-            row_index = selected_rows[0]  # Get the selected row index
+        row = viewData[selected_rows[0]]  # The virtual data is already a list of dicts
+
+        # Coordinates are validated when the data is loaded
+        lat = row.get('location_lat', DEFAULT_LAT)
+        lon = row.get('location_long', DEFAULT_LON)
+
+        # Extract the dog's name and breed for the tooltip, with fallbacks for empty values
+        name = row.get('name') or "No name found"
+        breed = (row.get('breed') or '').strip() or "No breed found"
+
+        # Return updated map center and marker
+        return [lat, lon], [
+            BASE_TILE_LAYER,
+            dl.Marker(
+                position=[lat, lon],
+                children=[
+                    dl.Tooltip(name),  # Show dog's name in the tooltip
+                    dl.Popup([
+                        html.H1("Animal Name"),
+                        html.P(name),
+                        html.P(f"Breed: {breed}")
+                    ])
+                ]
+            )
+        ]
 
-            # Extract latitude and longitude
-            lat = dff.iloc[row_index].get('location_lat', DEFAULT_LAT)
-            lon = dff.iloc[row_index].get('location_long', DEFAULT_LON)
+    except Exception as e:
+        log.error("Error in update_map callback: %s", e)
+        return DEFAULT_CENTER, DEFAULT_MAP_CHILDREN
 
-            # Validate and convert latitude and longitude
-            try:
-                lat = float(lat)
-                lon = float(lon)
-                print(f"Valid coordinates for row {row_index}: lat={lat}, lon={lon}")
-            except (ValueError, TypeError):
-                print(f"Invalid coordinates for row {row_index}: lat={lat}, lon={lon}")
-                lat, lon = DEFAULT_LAT, DEFAULT_LON
-
-            # Extract the dog's name for the tooltip
-            name = dff.iloc[row_index].get('name', 'Unknown')
-            #Extract the dog's breed for the tooltip
-            breed = dff.iloc[row_index].get('breed', 'Unknown').strip()
-
-            
-            if not name:  # If the name is empty or missing
-                name = "No name found"
-                
-            if not breed:  # If the name is empty or missing
-                breed = "No breed found"
-            # Debug: Print final coordinates and marker details
-            print(f"Updating map with center: [{lat}, {lon}] and marker for: {name}")
-
-            # Return updated map center and marker
-            return [lat, lon], [
-                dl.TileLayer(id="base-layer-id"),
-                dl.Marker(
-                    position=[lat, lon],
-                    children=[
-                        dl.Tooltip(name),  # Show dog's name in the tooltip
-                        dl.Popup([
-                            html.H1("Animal Name"),
-                            html.P(name),
-                            html.P(f"Breed: {breed}")
-                        ])
-                    ]
-                )
-            ]
-        else:
-            # If no row is selected, return the default map view
-            print("No row selected.")
-            return [DEFAULT_LAT, DEFAULT_LON], [dl.TileLayer(id="base-layer-id")]
+@functools.lru_cache(maxsize=64)
+def column_styles(columns):
+    """
+    Build the highlight styles for a tuple of selected column ids (cached per selection).
+    """
+    return [
+        {
+            'if': {'column_id': i},
+            'background_color': '#D2F3FF'
+        } for i in columns
+    ]
 
-    except Exception as e:
-        print(f"Error in update_map callback: {e}")
-        return [DEFAULT_LAT, DEFAULT_LON], [dl.TileLayer(id="base-layer-id")]
 
 #Callback for highlighting column
 @app.callback(
@@ -309,14 +415,7 @@ def update_styles(selected_columns):
     """
     Highlight the selected columns in the DataTable.
     """
-    if not selected_columns:
-        return []
-    return [
-        {
-            'if': {'column_id': i},
-            'background_color': '#D2F3FF'
-        } for i in selected_columns
-    ]
+    return column_styles(tuple(selected_columns or ()))
 
 # ============================================================
 # Run the Dash application